@@ -1,8 +1,26 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+import json
+import os
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from app.td_logic import score_ticker
+from app.watchlist import Watchlist, normalize_tickers, offer
 
-app = FastAPI()
+watchlist = Watchlist(poll_seconds=float(os.getenv("WATCHLIST_POLL_SECONDS", "60")))
+
+# Messages waiting for a slow client before the oldest start being dropped
+WATCHLIST_QUEUE_SIZE = 100
+# Tickers one connection may watch at a time
+WATCHLIST_MAX_TICKERS = 50
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    watchlist.start()
+    yield
+    await watchlist.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS so the Streamlit app can call this API
 app.add_middleware(
@@ -32,4 +50,84 @@ def score(ticker: str):
         result = score_ticker(ticker)
         return result
     except Exception as e:
-        return {"error": str(e)} 
\ No newline at end of file
+        return {"error": str(e)}
+
+@app.get("/watchlist")
+def watchlist_tickers():
+    """List the tickers currently tracked by the watchlist daemon."""
+    return {"tickers": sorted(watchlist.tickers)}
+
+@app.websocket("/ws/watchlist")
+async def watchlist_socket(websocket: WebSocket, tickers: str = ""):
+    """
+    Stream live TD Score updates for a set of tickers.
+    Connect with ?tickers=ASIANPAINT.NS,RELIANCE.BO and/or send
+    {"action": "subscribe" | "unsubscribe", "tickers": [...]}.
+    Messages pushed to the client:
+    - snapshot: full result when a ticker is first subscribed
+    - delta: score change plus the new result, only when inputs moved
+    - error: the ticker could not be scored, the message was invalid, or
+      the connection would watch more than WATCHLIST_MAX_TICKERS tickers
+    - dropped: the ticker kept failing and is no longer tracked
+    """
+    await websocket.accept()
+    queue = asyncio.Queue(maxsize=WATCHLIST_QUEUE_SIZE)
+
+    async def push():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    subscribed = set()
+
+    async def add(requested):
+        requested = normalize_tickers(requested)
+        if len(subscribed.union(requested)) > WATCHLIST_MAX_TICKERS:
+            offer(queue, {"type": "error", "error": f"At most {WATCHLIST_MAX_TICKERS} tickers per connection."})
+            return
+        subscribed.update(requested)
+        await watchlist.subscribe(queue, requested)
+
+    pusher = asyncio.create_task(push())
+    try:
+        await add(tickers.split(","))
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                if message.get("text") is None:
+                    raise ValueError("Messages must be JSON text frames.")
+                action, requested = parse_watchlist_message(message["text"])
+            except ValueError as e:
+                offer(queue, {"type": "error", "error": str(e)})
+                continue
+            if action == "unsubscribe":
+                requested = normalize_tickers(requested)
+                subscribed.difference_update(requested)
+                watchlist.unsubscribe(queue, requested)
+            else:
+                await add(requested)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watchlist.unsubscribe(queue)
+        pusher.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await pusher
+
+def parse_watchlist_message(text: str):
+    """Validate a client message, returning (action, tickers)"""
+    try:
+        message = json.loads(text)
+    except json.JSONDecodeError:
+        raise ValueError("Message must be valid JSON.")
+    if not isinstance(message, dict):
+        raise ValueError("Message must be a JSON object.")
+    action = message.get("action", "subscribe")
+    if action not in ("subscribe", "unsubscribe"):
+        raise ValueError('action must be "subscribe" or "unsubscribe".')
+    tickers = message.get("tickers")
+    if not isinstance(tickers, list) or not all(isinstance(t, str) for t in tickers):
+        raise ValueError("tickers must be a list of strings.")
+    return action, tickers
+
@@ -25,90 +25,106 @@ def check_forensic_flag(ticker: str) -> bool:
     except:
         return False
 
-def score_ticker(ticker):
-    try:
-        stock = yf.Ticker(ticker)
-        
-        # Get 5y data
+# info fields read by compute_score; a change in any of them (or in the latest
+# close) is what makes a re-score worthwhile
+SCORE_INPUT_FIELDS = (
+    'longBusinessSummary', 'sector', 'heldPercentInsiders', 'returnOnEquity',
+    'debtToEquity', 'freeCashflow', 'operatingCashflow', 'netIncome',
+    'totalCash', 'totalDebt', 'trailingPE', 'priceToBook', 'beta', 'trailingEps',
+)
+
+def fetch_inputs(ticker: str):
+    """Fetch the 5y price history and info dict that compute_score needs"""
+    stock = yf.Ticker(ticker)
+
+    # Get 5y data
+    hist = stock.history(period="5y")
+    if hist.empty:
+        # Retry once if first attempt fails
+        time.sleep(2)
         hist = stock.history(period="5y")
-        if hist.empty:
-            # Retry once if first attempt fails
-            time.sleep(2)
-            hist = stock.history(period="5y")
 
-        if hist.empty:
-            raise ValueError("No historical data found.")
-
-        info = stock.info
-
-        if not info or "shortName" not in info:
-            raise ValueError("Failed to load financial info.")
-
-        score = 0
-        breakdown = {}
-
-        # 1. Business Quality & Moat
-        moat = 0
-        if info.get('longBusinessSummary'): moat += 6
-        if info.get('sector') not in ['Financial Services', 'Cyclicals']: moat += 4
-        breakdown['Business Quality & Moat'] = moat
-        score += moat
-
-        # 2. Management Quality
-        mgmt = 0
-        if info.get('heldPercentInsiders', 0) > 0.1: mgmt += 5
-        if info.get('returnOnEquity', 0) > 0.15: mgmt += 5
-        breakdown['Management Quality'] = mgmt
-        score += mgmt
-
-        # 3. Financial Strength
-        fin = 0
-        if info.get('debtToEquity', 100) < 1: fin += 5
-        if info.get('freeCashflow', 0) > 0: fin += 5
-        breakdown['Financial Strength'] = fin
-        score += fin
-
-        # 4. Forensic Accounting
-        forensic = 0
-        ocf_net = info.get('operatingCashflow', 1) / max(info.get('netIncome', 1), 1)
-        if ocf_net > 1: forensic += 6
-        if info.get('totalCash', 0) > info.get('totalDebt', 0): forensic += 4
-        breakdown['Forensic Accounting'] = forensic
-        score += forensic
-
-        # 5. Valuation
-        val = 0
-        if info.get('trailingPE', 50) < 30: val += 5
-        if info.get('priceToBook', 10) < 5: val += 5
-        breakdown['Valuation'] = val
-        score += val
-
-        # 6. Risk Profile
-        risk = 0
-        if info.get('beta', 1.2) < 1.2: risk += 5
-        if info.get('trailingEps', 0) > 0: risk += 5
-        breakdown['Risk Profile'] = risk
-        score += risk
-
-        # 7. Conviction
-        conviction = 5
-        breakdown['Conviction'] = conviction
-        score += conviction
-
-        # 8. Quant Edge
-        returns = hist['Close'].pct_change().dropna()
-        sharpe = (returns.mean() / returns.std()) * (252 ** 0.5)
-        quant = 4 if sharpe > 1 else 0
-        breakdown['Quant Edge'] = quant
-        score += quant
-
-        return {
-            "TD Score": score,
-            "Score %": round(score / 80 * 100, 2),
-            "Sharpe (5Y)": round(sharpe, 2),
-            "Breakdown": breakdown,
-            "Forensic Red Flag": ocf_net < 1
-        }
+    if hist.empty:
+        raise ValueError("No historical data found.")
+
+    info = stock.info
+
+    if not info or "shortName" not in info:
+        raise ValueError("Failed to load financial info.")
+
+    return info, hist
+
+def compute_score(info: Dict[str, Any], hist) -> Dict[str, Any]:
+    """Score already-fetched inputs without touching the network"""
+    score = 0
+    breakdown = {}
+
+    # 1. Business Quality & Moat
+    moat = 0
+    if info.get('longBusinessSummary'): moat += 6
+    if info.get('sector') not in ['Financial Services', 'Cyclicals']: moat += 4
+    breakdown['Business Quality & Moat'] = moat
+    score += moat
+
+    # 2. Management Quality
+    mgmt = 0
+    if info.get('heldPercentInsiders', 0) > 0.1: mgmt += 5
+    if info.get('returnOnEquity', 0) > 0.15: mgmt += 5
+    breakdown['Management Quality'] = mgmt
+    score += mgmt
+
+    # 3. Financial Strength
+    fin = 0
+    if info.get('debtToEquity', 100) < 1: fin += 5
+    if info.get('freeCashflow', 0) > 0: fin += 5
+    breakdown['Financial Strength'] = fin
+    score += fin
+
+    # 4. Forensic Accounting
+    forensic = 0
+    ocf_net = info.get('operatingCashflow', 1) / max(info.get('netIncome', 1), 1)
+    if ocf_net > 1: forensic += 6
+    if info.get('totalCash', 0) > info.get('totalDebt', 0): forensic += 4
+    breakdown['Forensic Accounting'] = forensic
+    score += forensic
+
+    # 5. Valuation
+    val = 0
+    if info.get('trailingPE', 50) < 30: val += 5
+    if info.get('priceToBook', 10) < 5: val += 5
+    breakdown['Valuation'] = val
+    score += val
+
+    # 6. Risk Profile
+    risk = 0
+    if info.get('beta', 1.2) < 1.2: risk += 5
+    if info.get('trailingEps', 0) > 0: risk += 5
+    breakdown['Risk Profile'] = risk
+    score += risk
+
+    # 7. Conviction
+    conviction = 5
+    breakdown['Conviction'] = conviction
+    score += conviction
+
+    # 8. Quant Edge
+    returns = hist['Close'].pct_change().dropna()
+    sharpe = (returns.mean() / returns.std()) * (252 ** 0.5)
+    quant = 4 if sharpe > 1 else 0
+    breakdown['Quant Edge'] = quant
+    score += quant
+
+    return {
+        "TD Score": score,
+        "Score %": round(score / 80 * 100, 2),
+        "Sharpe (5Y)": round(sharpe, 2),
+        "Breakdown": breakdown,
+        "Forensic Red Flag": ocf_net < 1
+    }
 
+def score_ticker(ticker):
+    try:
+        info, hist = fetch_inputs(ticker)
+        return compute_score(info, hist)
     except Exception as e:
-        return {"error": f"Error analyzing {ticker}: {str(e)}"} 
\ No newline at end of file
+        return {"error": f"Error analyzing {ticker}: {str(e)}"}
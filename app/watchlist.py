@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import math
+from datetime import datetime, date, time as dtime
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import yfinance as yf
+
+from app.td_logic import SCORE_INPUT_FIELDS, fetch_inputs, compute_score
+
+logger = logging.getLogger(__name__)
+
+# (timezone, open, close) per exchange; anything without a known suffix is
+# treated as a US listing
+MARKET_HOURS = {
+    '.NS': ('Asia/Kolkata', dtime(9, 15), dtime(15, 30)),
+    '.BO': ('Asia/Kolkata', dtime(9, 15), dtime(15, 30)),
+}
+DEFAULT_MARKET_HOURS = ('America/New_York', dtime(9, 30), dtime(16, 0))
+
+# A ticker whose initial load fails this many times in a row is dropped
+MAX_LOAD_FAILURES = 3
+# Longest wait between retries of a failed history load, in seconds
+MAX_RETRY_DELAY = 15 * 60
+
+def market_hours(ticker: str) -> Tuple[str, dtime, dtime]:
+    return next(
+        (hours for suffix, hours in MARKET_HOURS.items() if ticker.endswith(suffix)),
+        DEFAULT_MARKET_HOURS,
+    )
+
+def exchange_now(ticker: str, now: Optional[datetime] = None) -> datetime:
+    """Current time in the ticker's exchange timezone"""
+    tz = market_hours(ticker)[0]
+    return (now or datetime.now(tz=ZoneInfo('UTC'))).astimezone(ZoneInfo(tz))
+
+def market_is_open(ticker: str, now: Optional[datetime] = None) -> bool:
+    """Check whether the ticker's exchange is in its regular weekday session"""
+    _, open_at, close_at = market_hours(ticker)
+    local = exchange_now(ticker, now)
+    return local.weekday() < 5 and open_at <= local.time() <= close_at
+
+def fetch_latest_bar(ticker: str) -> pd.DataFrame:
+    """Fetch today's daily bar; this is the cheap quote poll"""
+    bar = yf.Ticker(ticker).history(period="1d")
+    if bar.empty:
+        raise ValueError("No quote returned.")
+    return bar.tail(1)
+
+def fetch_info(ticker: str) -> Dict[str, Any]:
+    info = yf.Ticker(ticker).info
+    if not info or "shortName" not in info:
+        raise ValueError("Failed to load financial info.")
+    return info
+
+def normalize_tickers(tickers: Iterable[str]) -> List[str]:
+    """Strip and upper-case tickers, dropping blanks and duplicates"""
+    return list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+
+def offer(queue: asyncio.Queue, message: Dict[str, Any]):
+    """Queue a message, dropping the oldest one if a slow client's queue is full"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+def json_safe(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a compute_score result into plain JSON types (NaN becomes None)"""
+    def clean(value):
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        if hasattr(value, 'item'):
+            # numpy scalar
+            value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return value
+    return clean(result)
+
+def score_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Difference between two json_safe results, changed categories only"""
+    sharpe_old, sharpe_new = old["Sharpe (5Y)"], new["Sharpe (5Y)"]
+    return {
+        "TD Score": new["TD Score"] - old["TD Score"],
+        "Score %": round(new["Score %"] - old["Score %"], 2),
+        "Sharpe (5Y)": (
+            None if sharpe_old is None or sharpe_new is None
+            else round(sharpe_new - sharpe_old, 2)
+        ),
+        "Breakdown": {
+            category: pts - old["Breakdown"].get(category, 0)
+            for category, pts in new["Breakdown"].items()
+            if pts != old["Breakdown"].get(category, 0)
+        },
+        "Forensic Red Flag": new["Forensic Red Flag"],
+    }
+
+def make_fingerprint(info: Dict[str, Any], hist: pd.DataFrame) -> Tuple:
+    return (
+        tuple(info.get(field) for field in SCORE_INPUT_FIELDS),
+        hist.index[-1],
+        hist['Close'].iloc[-1],
+    )
+
+class TickerState:
+    """Cached inputs and last score for one tracked ticker"""
+
+    def __init__(self, info: Dict[str, Any], hist: pd.DataFrame, session: date):
+        self.result = json_safe(compute_score(info, hist))
+        self.info = info
+        self.hist = hist
+        self.fingerprint = make_fingerprint(info, hist)
+        # Exchange-local date the full history was fetched on
+        self.session = session
+
+    def latest_bar_matches(self, bar: pd.DataFrame) -> bool:
+        return (
+            bar.index[-1] == self.hist.index[-1]
+            and bar['Close'].iloc[-1] == self.hist['Close'].iloc[-1]
+        )
+
+    def apply(self, info: Dict[str, Any], bar: pd.DataFrame) -> bool:
+        """
+        Merge fresh info and today's bar, re-scoring if the scoring inputs
+        moved. Returns True if it re-scored. Nothing is kept if scoring fails.
+        """
+        hist = pd.concat([self.hist, bar])
+        hist = hist[~hist.index.duplicated(keep='last')]
+        fingerprint = make_fingerprint(info, hist)
+        if fingerprint == self.fingerprint:
+            self.info, self.hist = info, hist
+            return False
+        self.result = json_safe(compute_score(info, hist))
+        self.info, self.hist, self.fingerprint = info, hist, fingerprint
+        return True
+
+class Watchlist:
+    """
+    Long-running poller for a set of tracked tickers.
+
+    During market hours each ticker's latest bar is polled every
+    poll_seconds. Info is only re-fetched when the bar moved, and the
+    ticker is only re-scored when one of SCORE_INPUT_FIELDS or the latest
+    close actually changed. The full history is re-fetched on the first
+    poll of each session so official closes and adjustments match
+    score_ticker. Score deltas are pushed to every subscriber queue
+    watching that ticker.
+    """
+
+    def __init__(self, poll_seconds: float = 60):
+        self.poll_seconds = poll_seconds
+        self.states: Dict[str, TickerState] = {}
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.failures: Dict[str, int] = {}
+        self.retry_at: Dict[str, float] = {}
+        self.last_error: Dict[str, str] = {}
+        self._loads: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def tickers(self) -> Set[str]:
+        return set(self.subscribers)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        # Stop the poll loop and any in-flight loads so nothing publishes
+        # to subscribers after shutdown
+        tasks = [task for task in [self._task, *self._loads.values()] if task is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._loads.clear()
+
+    async def subscribe(self, queue: asyncio.Queue, tickers: Iterable[str]):
+        loads = []
+        for ticker in normalize_tickers(tickers):
+            self.subscribers.setdefault(ticker, set()).add(queue)
+            state = self.states.get(ticker)
+            if state is not None:
+                offer(queue, {"type": "snapshot", "ticker": ticker, "result": state.result})
+            elif not self._can_retry(ticker):
+                # Recently failed; don't hit Yahoo again for a new subscriber
+                offer(queue, {"type": "error", "ticker": ticker, "error": self.last_error[ticker]})
+            else:
+                # Score straight away so new subscribers don't wait for the
+                # next tick (or for the market to open); the load publishes
+                # the snapshot to everyone subscribed by the time it finishes
+                loads.append(self._load(ticker))
+        await asyncio.gather(*loads)
+
+    def unsubscribe(self, queue: asyncio.Queue, tickers: Optional[Iterable[str]] = None):
+        for ticker in normalize_tickers(tickers if tickers is not None else list(self.subscribers)):
+            queues = self.subscribers.get(ticker)
+            if not queues:
+                continue
+            queues.discard(queue)
+            if not queues:
+                # Nobody is watching any more; stop polling it
+                self._forget(ticker)
+
+    async def run(self):
+        while True:
+            for ticker in list(self.subscribers):
+                if not market_is_open(ticker):
+                    continue
+                try:
+                    await self.poll(ticker)
+                except Exception:
+                    logger.exception("Watchlist poll failed for %s", ticker)
+            await asyncio.sleep(self.poll_seconds)
+
+    async def poll(self, ticker: str):
+        if ticker not in self.subscribers:
+            # Dropped or unsubscribed since the loop started this pass
+            return
+        state = self.states.get(ticker)
+        if state is None or state.session != exchange_now(ticker).date():
+            # Never loaded, or first poll of a new session
+            if self._can_retry(ticker):
+                if await self._load(ticker) is not None:
+                    return
+                state = self.states.get(ticker)
+            if state is None:
+                return
+            # Refresh failed or is backing off; keep polling bars on the
+            # cached history meanwhile
+
+        try:
+            bar = await asyncio.to_thread(fetch_latest_bar, ticker)
+            if state.latest_bar_matches(bar):
+                return
+            info = await asyncio.to_thread(fetch_info, ticker)
+            old = state.result
+            if not state.apply(info, bar):
+                return
+        except Exception as e:
+            logger.warning("Watchlist poll failed for %s: %s", ticker, e)
+            return
+
+        self._publish_change(ticker, old, state.result)
+
+    async def _load(self, ticker: str) -> Optional[TickerState]:
+        """Fetch and score the full history; concurrent callers share one fetch"""
+        task = self._loads.get(ticker)
+        if task is None:
+            task = self._loads[ticker] = asyncio.create_task(self._fetch_and_score(ticker))
+            task.add_done_callback(lambda t: self._loads.get(ticker) is t and self._loads.pop(ticker))
+        # Shielded so a disconnecting subscriber doesn't cancel everyone's load
+        return await asyncio.shield(task)
+
+    async def _fetch_and_score(self, ticker: str) -> Optional[TickerState]:
+        old = self.states.get(ticker)
+        try:
+            info, hist = await asyncio.to_thread(fetch_inputs, ticker)
+            state = TickerState(info, hist, session=exchange_now(ticker).date())
+        except Exception as e:
+            self._load_failed(ticker, e, had_state=old is not None)
+            return None
+        self.failures.pop(ticker, None)
+        self.retry_at.pop(ticker, None)
+        self.last_error.pop(ticker, None)
+        if ticker not in self.subscribers:
+            # Unsubscribed while we were fetching
+            return None
+        self.states[ticker] = state
+        if old is None:
+            self._publish(ticker, {"type": "snapshot", "ticker": ticker, "result": state.result})
+        else:
+            self._publish_change(ticker, old.result, state.result)
+        return state
+
+    def _load_failed(self, ticker: str, error: Exception, had_state: bool):
+        failures = self.failures[ticker] = self.failures.get(ticker, 0) + 1
+        message = self.last_error[ticker] = f"Error analyzing {ticker}: {str(error)}"
+        if had_state:
+            # Keep serving the cached score; retry the refresh later
+            logger.warning("Watchlist refresh failed for %s: %s", ticker, error)
+        elif failures >= MAX_LOAD_FAILURES:
+            self._publish(ticker, {"type": "dropped", "ticker": ticker, "error": message})
+            self._forget(ticker)
+            return
+        else:
+            self._publish(ticker, {"type": "error", "ticker": ticker, "error": message})
+        # Back off exponentially so a bad ticker doesn't hammer Yahoo
+        delay = min(self.poll_seconds * 2 ** min(failures - 1, 16), MAX_RETRY_DELAY)
+        self.retry_at[ticker] = asyncio.get_running_loop().time() + delay
+
+    def _can_retry(self, ticker: str) -> bool:
+        return asyncio.get_running_loop().time() >= self.retry_at.get(ticker, 0)
+
+    def _forget(self, ticker: str):
+        self.subscribers.pop(ticker, None)
+        self.states.pop(ticker, None)
+        self.failures.pop(ticker, None)
+        self.retry_at.pop(ticker, None)
+        self.last_error.pop(ticker, None)
+
+    def _publish_change(self, ticker: str, old: Dict[str, Any], new: Dict[str, Any]):
+        if new != old:
+            self._publish(ticker, {"type": "delta", "ticker": ticker, "delta": score_delta(old, new), "result": new})
+
+    def _publish(self, ticker: str, message: Dict[str, Any]):
+        for queue in self.subscribers.get(ticker, ()):
+            offer(queue, message)
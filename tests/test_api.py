@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+import app.watchlist as watchlist
+from api.main import WATCHLIST_MAX_TICKERS, parse_watchlist_message
+
+INFO = {"shortName": "Test Co", "trailingPE": 20, "priceToBook": 3}
+
+@pytest.fixture
+def client(monkeypatch):
+    """API client with Yahoo stubbed out and the poll loop kept idle"""
+    calls = []
+
+    def fake_fetch_inputs(ticker):
+        calls.append(ticker)
+        if ticker == "FOO":
+            raise ValueError("No historical data found.")
+        index = pd.date_range("2024-01-01", periods=4, tz="Asia/Kolkata")
+        return dict(INFO), pd.DataFrame({"Close": [100.0, 101.0, 99.0, 102.0]}, index=index)
+
+    monkeypatch.setattr(watchlist, "fetch_inputs", fake_fetch_inputs)
+    monkeypatch.setattr(watchlist, "market_is_open", lambda ticker: False)
+    monkeypatch.setattr(main, "watchlist", watchlist.Watchlist())
+    with TestClient(main.app) as client:
+        client.fetch_calls = calls
+        yield client
+
+
+# parse_watchlist_message
+
+def test_parse_watchlist_message_defaults_to_subscribe():
+    assert parse_watchlist_message('{"tickers": ["TCS.NS"]}') == ("subscribe", ["TCS.NS"])
+    assert parse_watchlist_message('{"action": "unsubscribe", "tickers": []}') == ("unsubscribe", [])
+
+@pytest.mark.parametrize("text, error", [
+    ("not json", "Message must be valid JSON."),
+    ('["TCS.NS"]', "Message must be a JSON object."),
+    ('"TCS.NS"', "Message must be a JSON object."),
+    ('{"action": "replace", "tickers": []}', 'action must be "subscribe" or "unsubscribe".'),
+    ('{"tickers": "TCS.NS"}', "tickers must be a list of strings."),
+    ('{"tickers": ["TCS.NS", 1]}', "tickers must be a list of strings."),
+    ('{}', "tickers must be a list of strings."),
+])
+def test_parse_watchlist_message_rejects_bad_input(text, error):
+    with pytest.raises(ValueError, match=error):
+        parse_watchlist_message(text)
+
+
+# /ws/watchlist
+
+def test_watchlist_socket_subscribe_and_unsubscribe(client):
+    with client.websocket_connect("/ws/watchlist?tickers=tcs.ns") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["ticker"] == "TCS.NS"
+        assert snapshot["result"]["TD Score"] > 0
+
+        ws.send_json({"tickers": ["INFY.NS"]})
+        assert ws.receive_json()["ticker"] == "INFY.NS"
+        assert client.get("/watchlist").json() == {"tickers": ["INFY.NS", "TCS.NS"]}
+
+        ws.send_json({"action": "unsubscribe", "tickers": ["tcs.ns"]})
+        ws.send_text("ping")    # round trip so the unsubscribe has been handled
+        assert ws.receive_json()["type"] == "error"
+        assert client.get("/watchlist").json() == {"tickers": ["INFY.NS"]}
+
+    assert client.get("/watchlist").json() == {"tickers": []}
+    assert client.fetch_calls == ["TCS.NS", "INFY.NS"]
+
+def test_watchlist_socket_reports_bad_input_and_stays_open(client):
+    with client.websocket_connect("/ws/watchlist") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json() == {"type": "error", "error": "Message must be valid JSON."}
+        ws.send_bytes(b"x")
+        assert ws.receive_json() == {"type": "error", "error": "Messages must be JSON text frames."}
+        ws.send_json({"tickers": "AAPL"})
+        assert ws.receive_json() == {"type": "error", "error": "tickers must be a list of strings."}
+
+        ws.send_json({"tickers": ["TCS.NS"]})
+        assert ws.receive_json()["type"] == "snapshot"
+    assert client.fetch_calls == ["TCS.NS"]
+
+def test_watchlist_socket_reports_failed_ticker(client):
+    with client.websocket_connect("/ws/watchlist?tickers=FOO") as ws:
+        assert ws.receive_json() == {
+            "type": "error", "ticker": "FOO", "error": "Error analyzing FOO: No historical data found.",
+        }
+
+def test_watchlist_socket_limits_tickers(client):
+    too_many = ",".join(f"T{n}.NS" for n in range(WATCHLIST_MAX_TICKERS + 1))
+    with client.websocket_connect(f"/ws/watchlist?tickers={too_many}") as ws:
+        assert ws.receive_json() == {
+            "type": "error", "error": f"At most {WATCHLIST_MAX_TICKERS} tickers per connection.",
+        }
+        assert client.get("/watchlist").json() == {"tickers": []}
+
+        ws.send_json({"tickers": [f"T{n}.NS" for n in range(WATCHLIST_MAX_TICKERS)]})
+        for _ in range(WATCHLIST_MAX_TICKERS):
+            assert ws.receive_json()["type"] == "snapshot"
+        ws.send_json({"tickers": ["ONE.MORE"]})
+        assert ws.receive_json()["type"] == "error"
+    assert client.fetch_calls == [f"T{n}.NS" for n in range(WATCHLIST_MAX_TICKERS)]
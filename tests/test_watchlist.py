@@ -0,0 +1,379 @@
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import pytest
+
+import app.watchlist as watchlist
+from app.watchlist import (
+    MAX_LOAD_FAILURES, MAX_RETRY_DELAY, TickerState, Watchlist, json_safe,
+    market_is_open, normalize_tickers, offer, score_delta,
+)
+
+INFO = {"shortName": "Test Co", "trailingPE": 20, "priceToBook": 3}
+
+def make_hist(closes, start="2024-01-01"):
+    index = pd.date_range(start, periods=len(closes), tz="Asia/Kolkata")
+    return pd.DataFrame({"Close": closes}, index=index)
+
+def make_result(score=40, breakdown=None, sharpe=1.0, red_flag=False):
+    return {
+        "TD Score": score,
+        "Score %": round(score / 80 * 100, 2),
+        "Sharpe (5Y)": sharpe,
+        "Breakdown": breakdown or {"Valuation": 10},
+        "Forensic Red Flag": red_flag,
+    }
+
+def drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Stub fetch_inputs, recording calls; tickers in `failing` raise"""
+    calls = []
+    failing = set()
+
+    def fake_fetch_inputs(ticker):
+        calls.append(ticker)
+        if ticker in failing:
+            raise ValueError("No historical data found.")
+        return dict(INFO), make_hist([100.0, 101.0, 99.0, 102.0])
+
+    monkeypatch.setattr(watchlist, "fetch_inputs", fake_fetch_inputs)
+    fake_fetch_inputs.calls = calls
+    fake_fetch_inputs.failing = failing
+    return fake_fetch_inputs
+
+
+# market_is_open
+
+@pytest.mark.parametrize("ticker, local, expected", [
+    ("RELIANCE.NS", datetime(2024, 6, 3, 9, 15), True),    # Monday open
+    ("RELIANCE.NS", datetime(2024, 6, 3, 15, 30), True),   # close edge
+    ("RELIANCE.NS", datetime(2024, 6, 3, 9, 14), False),
+    ("RELIANCE.NS", datetime(2024, 6, 3, 15, 31), False),
+    ("RELIANCE.BO", datetime(2024, 6, 3, 12, 0), True),
+    ("RELIANCE.NS", datetime(2024, 6, 1, 12, 0), False),   # Saturday
+    ("RELIANCE.NS", datetime(2024, 6, 2, 12, 0), False),   # Sunday
+])
+def test_market_is_open_india(ticker, local, expected):
+    now = local.replace(tzinfo=ZoneInfo("Asia/Kolkata"))
+    assert market_is_open(ticker, now) is expected
+
+@pytest.mark.parametrize("local, expected", [
+    (datetime(2024, 6, 3, 9, 29), False),
+    (datetime(2024, 6, 3, 9, 30), True),
+    (datetime(2024, 6, 3, 16, 0), True),
+    (datetime(2024, 6, 3, 16, 1), False),
+])
+def test_market_is_open_defaults_to_us_hours(local, expected):
+    now = local.replace(tzinfo=ZoneInfo("America/New_York"))
+    assert market_is_open("AAPL", now) is expected
+
+def test_market_is_open_converts_from_utc():
+    # 04:00 UTC is 09:30 IST but 00:00 in New York
+    now = datetime(2024, 6, 3, 4, 0, tzinfo=ZoneInfo("UTC"))
+    assert market_is_open("TCS.NS", now)
+    assert not market_is_open("AAPL", now)
+
+
+# score_delta / json_safe
+
+def test_score_delta_lists_only_changed_categories():
+    old = make_result(40, {"Valuation": 10, "Quant Edge": 4}, sharpe=1.25)
+    new = make_result(35, {"Valuation": 5, "Quant Edge": 4}, sharpe=1.0, red_flag=True)
+    assert score_delta(old, new) == {
+        "TD Score": -5,
+        "Score %": -6.25,
+        "Sharpe (5Y)": -0.25,
+        "Breakdown": {"Valuation": -5},
+        "Forensic Red Flag": True,
+    }
+
+def test_score_delta_with_missing_sharpe():
+    assert score_delta(make_result(sharpe=None), make_result(sharpe=1.0))["Sharpe (5Y)"] is None
+
+def test_json_safe_replaces_nan_and_unwraps_numpy():
+    np = pytest.importorskip("numpy")
+    result = json_safe(make_result(sharpe=np.float64("nan"), red_flag=np.bool_(True)))
+    assert result["Sharpe (5Y)"] is None
+    assert result["Forensic Red Flag"] is True
+    assert type(result["Forensic Red Flag"]) is bool
+
+
+# TickerState
+
+def test_latest_bar_matches():
+    state = TickerState(dict(INFO), make_hist([100.0, 101.0]), session=None)
+    assert state.latest_bar_matches(make_hist([101.0], start="2024-01-02"))
+    assert not state.latest_bar_matches(make_hist([101.5], start="2024-01-02"))
+    assert not state.latest_bar_matches(make_hist([101.0], start="2024-01-03"))
+
+def test_apply_skips_rescore_when_inputs_unchanged():
+    state = TickerState(dict(INFO), make_hist([100.0, 101.0]), session=None)
+    result = state.result
+    assert not state.apply(dict(INFO, longName="ignored"), make_hist([101.0], start="2024-01-02"))
+    assert state.result is result
+    assert len(state.hist) == 2
+
+def test_apply_rescores_on_new_bar_and_price_fields():
+    state = TickerState(dict(INFO), make_hist([100.0, 101.0]), session=None)
+    assert state.apply(dict(INFO, trailingPE=45), make_hist([103.0], start="2024-01-03"))
+    assert len(state.hist) == 3
+    assert state.result["Breakdown"]["Valuation"] == 5
+
+def test_apply_replaces_todays_bar():
+    state = TickerState(dict(INFO), make_hist([100.0, 101.0]), session=None)
+    assert state.apply(dict(INFO), make_hist([102.0], start="2024-01-02"))
+    assert list(state.hist["Close"]) == [100.0, 102.0]
+
+def test_apply_keeps_old_state_when_scoring_fails():
+    state = TickerState(dict(INFO), make_hist([100.0, 101.0]), session=None)
+    hist, result = state.hist, state.result
+    with pytest.raises(TypeError):
+        state.apply(dict(INFO, trailingPE=None), make_hist([103.0], start="2024-01-03"))
+    assert state.hist is hist
+    assert state.result is result
+
+
+# Watchlist subscriptions
+
+def test_subscribe_sends_one_snapshot_and_shares_loads(fetches):
+    async def scenario():
+        wl = Watchlist()
+        first, second = asyncio.Queue(), asyncio.Queue()
+        await asyncio.gather(
+            wl.subscribe(first, [" reliance.ns "]),
+            wl.subscribe(second, ["RELIANCE.NS"]),
+            wl.poll("RELIANCE.NS"),
+        )
+        return wl, drain(first), drain(second)
+
+    wl, first, second = asyncio.run(scenario())
+    assert fetches.calls == ["RELIANCE.NS"]
+    assert wl.tickers == {"RELIANCE.NS"}
+    assert [m["type"] for m in first] == ["snapshot"]
+    assert [m["type"] for m in second] == ["snapshot"]
+
+def test_subscribe_to_loaded_ticker_uses_cache(fetches):
+    async def scenario():
+        wl = Watchlist()
+        first, second = asyncio.Queue(), asyncio.Queue()
+        await wl.subscribe(first, ["TCS.NS"])
+        await wl.subscribe(second, ["TCS.NS"])
+        return drain(first), drain(second)
+
+    first, second = asyncio.run(scenario())
+    assert fetches.calls == ["TCS.NS"]
+    assert first == second
+
+def test_unsubscribe_stops_tracking_when_last_subscriber_leaves(fetches):
+    async def scenario():
+        wl = Watchlist()
+        first, second = asyncio.Queue(), asyncio.Queue()
+        await wl.subscribe(first, ["TCS.NS", "INFY.NS"])
+        await wl.subscribe(second, ["TCS.NS"])
+        wl.unsubscribe(first, ["infy.ns"])
+        assert wl.tickers == {"TCS.NS"}
+        assert "INFY.NS" not in wl.states
+        wl.unsubscribe(first)
+        assert wl.tickers == {"TCS.NS"}
+        wl.unsubscribe(second)
+        assert wl.tickers == set()
+        assert wl.states == {}
+
+    asyncio.run(scenario())
+
+def test_failed_loads_back_off_then_drop(fetches):
+    fetches.failing.add("FOO")
+
+    async def scenario():
+        wl = Watchlist(poll_seconds=0)
+        queue = asyncio.Queue()
+        await wl.subscribe(queue, ["FOO"])
+        for _ in range(MAX_LOAD_FAILURES + 2):
+            await wl.poll("FOO")
+        return wl, drain(queue)
+
+    wl, messages = asyncio.run(scenario())
+    assert fetches.calls == ["FOO"] * MAX_LOAD_FAILURES
+    assert [m["type"] for m in messages] == ["error"] * (MAX_LOAD_FAILURES - 1) + ["dropped"]
+    assert wl.tickers == set()
+
+def test_failed_load_waits_for_backoff(fetches):
+    fetches.failing.add("FOO")
+
+    async def scenario():
+        wl = Watchlist(poll_seconds=60)
+        await wl.subscribe(asyncio.Queue(), ["FOO"])
+        await wl.poll("FOO")
+
+    asyncio.run(scenario())
+    assert fetches.calls == ["FOO"]
+
+def test_subscribe_during_backoff_sends_last_error(fetches):
+    fetches.failing.add("FOO")
+
+    async def scenario():
+        wl = Watchlist(poll_seconds=60)
+        await wl.subscribe(asyncio.Queue(), ["FOO"])
+        late = asyncio.Queue()
+        await wl.subscribe(late, ["foo"])
+        return drain(late)
+
+    messages = asyncio.run(scenario())
+    assert fetches.calls == ["FOO"]
+    assert messages == [{"type": "error", "ticker": "FOO", "error": "Error analyzing FOO: No historical data found."}]
+
+def test_failed_refresh_keeps_polling_cached_state(fetches, monkeypatch):
+    bar_polls = []
+
+    def fake_fetch_latest_bar(ticker):
+        bar_polls.append(ticker)
+        return make_hist([102.0], start="2024-01-04")
+
+    monkeypatch.setattr(watchlist, "fetch_latest_bar", fake_fetch_latest_bar)
+
+    async def scenario():
+        wl = Watchlist(poll_seconds=60)
+        await wl.subscribe(asyncio.Queue(), ["TCS.NS"])
+        wl.states["TCS.NS"].session = None
+        fetches.failing.add("TCS.NS")
+        await wl.poll("TCS.NS")     # refresh fails, falls back to a bar poll
+        await wl.poll("TCS.NS")     # refresh backing off, bar poll only
+        return wl
+
+    wl = asyncio.run(scenario())
+    assert fetches.calls == ["TCS.NS", "TCS.NS"]
+    assert bar_polls == ["TCS.NS", "TCS.NS"]
+    assert "TCS.NS" in wl.states
+
+def test_retry_delay_is_capped(fetches):
+    fetches.failing.add("TCS.NS")
+
+    async def scenario():
+        wl = Watchlist(poll_seconds=60)
+        wl.subscribers["TCS.NS"] = {asyncio.Queue()}
+        wl.states["TCS.NS"] = TickerState(dict(INFO), make_hist([100.0, 101.0]), session=None)
+        # Refreshes have been failing for days
+        wl.failures["TCS.NS"] = 5000
+        await wl._load("TCS.NS")
+        loop = asyncio.get_running_loop()
+        return wl.retry_at["TCS.NS"] - loop.time()
+
+    assert 0 < asyncio.run(scenario()) <= MAX_RETRY_DELAY
+
+def test_subscribe_loads_tickers_concurrently(monkeypatch):
+    running = []
+    peak = []
+
+    async def slow_fetch(func, ticker):
+        running.append(ticker)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(ticker)
+        return dict(INFO), make_hist([100.0, 101.0])
+
+    monkeypatch.setattr(watchlist.asyncio, "to_thread", slow_fetch)
+
+    async def scenario():
+        wl = Watchlist()
+        queue = asyncio.Queue()
+        await wl.subscribe(queue, ["TCS.NS", "INFY.NS", "WIPRO.NS"])
+        return drain(queue)
+
+    messages = asyncio.run(scenario())
+    assert max(peak) == 3
+    assert sorted(m["ticker"] for m in messages) == ["INFY.NS", "TCS.NS", "WIPRO.NS"]
+
+def test_stop_cancels_in_flight_loads(monkeypatch):
+    async def hanging_fetch(func, ticker):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(watchlist.asyncio, "to_thread", hanging_fetch)
+
+    async def scenario():
+        wl = Watchlist()
+        queue = asyncio.Queue()
+        subscriber = asyncio.create_task(wl.subscribe(queue, ["TCS.NS"]))
+        while "TCS.NS" not in wl._loads:
+            await asyncio.sleep(0)
+        load = wl._loads["TCS.NS"]
+        await wl.stop()
+        subscriber.cancel()
+        return wl, load, drain(queue)
+
+    wl, load, messages = asyncio.run(scenario())
+    assert load.cancelled()
+    assert wl._loads == {}
+    assert messages == []
+
+def test_normalize_tickers():
+    assert normalize_tickers([" tcs.ns", "", "TCS.NS", "infy.ns "]) == ["TCS.NS", "INFY.NS"]
+
+def test_poll_pushes_delta_only_when_result_changes(fetches, monkeypatch):
+    bars = [make_hist([102.0], start="2024-01-04"), make_hist([60.0], start="2024-01-05")]
+    monkeypatch.setattr(watchlist, "fetch_latest_bar", lambda ticker: bars[0])
+    monkeypatch.setattr(watchlist, "fetch_info", lambda ticker: dict(INFO, trailingPE=45))
+
+    async def scenario():
+        wl = Watchlist()
+        queue = asyncio.Queue()
+        await wl.subscribe(queue, ["TCS.NS"])
+        wl.states["TCS.NS"].session = watchlist.exchange_now("TCS.NS").date()
+        drain(queue)
+        await wl.poll("TCS.NS")     # unchanged bar: nothing fetched or sent
+        after_same_bar = drain(queue)
+        bars[0] = bars[1]
+        await wl.poll("TCS.NS")
+        return after_same_bar, drain(queue)
+
+    after_same_bar, messages = asyncio.run(scenario())
+    assert after_same_bar == []
+    assert [m["type"] for m in messages] == ["delta"]
+    assert messages[0]["delta"]["Breakdown"]["Valuation"] == -5
+
+def test_poll_refetches_history_on_new_session(fetches):
+    async def scenario():
+        wl = Watchlist()
+        await wl.subscribe(asyncio.Queue(), ["TCS.NS"])
+        wl.states["TCS.NS"].session = None
+        await wl.poll("TCS.NS")
+
+    asyncio.run(scenario())
+    assert fetches.calls == ["TCS.NS", "TCS.NS"]
+
+def test_run_survives_poll_errors(monkeypatch):
+    polled = []
+
+    async def bad_poll(self, ticker):
+        polled.append(ticker)
+        raise TypeError("'>' not supported between instances of 'NoneType' and 'float'")
+
+    monkeypatch.setattr(Watchlist, "poll", bad_poll)
+    monkeypatch.setattr(watchlist, "market_is_open", lambda ticker: True)
+
+    async def scenario():
+        wl = Watchlist(poll_seconds=0)
+        wl.subscribers["TCS.NS"] = {asyncio.Queue()}
+        wl.start()
+        await asyncio.sleep(0.01)
+        assert not wl._task.done()
+        await wl.stop()
+
+    asyncio.run(scenario())
+    assert len(polled) > 1
+
+def test_offer_drops_oldest_when_full():
+    async def scenario():
+        queue = asyncio.Queue(maxsize=2)
+        for n in range(3):
+            offer(queue, n)
+        return drain(queue)
+
+    assert asyncio.run(scenario()) == [1, 2]